@@ -1,7 +1,8 @@
 import uvicorn
-from .config import settings
 
 if __name__ == "__main__":
+    from .config import settings
+
     uvicorn.run(
         "backend.main:app",
         host=settings.app_host,
@@ -1,9 +1,42 @@
+import os
+from dataclasses import dataclass, fields
 from pathlib import Path
-from pydantic import field_validator
-from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import Mapping, Optional
 
+ENV_PREFIX = "SUPER_CLIPBOARD_"
+ENV_FILE = Path(".env")
+CAPTCHA_PROVIDERS = frozenset({"turnstile", "recaptcha"})
+_CASTS = {Path: Path, int: int, float: float}
 
-class Settings(BaseSettings):
+
+def _read_env_file(path: Path) -> dict[str, str]:
+    # 只读取普通文件，避免 .env 是 FIFO 等特殊文件时阻塞启动
+    if not path.is_file():
+        return {}
+    values: dict[str, str] = {}
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        if line.startswith("export "):
+            line = line[len("export "):].lstrip()
+        key, value = line.split("=", 1)
+        value = value.strip()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+            value = value[1:-1]
+        values[key.strip()] = value
+    return values
+
+
+def _trim_optional(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    trimmed = value.strip()
+    return trimmed or None
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
     database_path: Path = Path("backend/storage/clipboard.db")
     file_storage_dir: Path = Path("backend/storage/files")
     app_host: str = "0.0.0.0"
@@ -20,39 +53,44 @@ class Settings(BaseSettings):
     captcha_bypass_token: str | None = None
     captcha_site_key: str | None = None
 
-    @field_validator("captcha_provider")
-    @classmethod
-    def normalize_provider(cls, value: str | None) -> str | None:
-        if value is None:
-            return None
-        normalized = value.strip().lower()
-        if normalized not in {"turnstile", "recaptcha"}:
-            raise ValueError("captcha_provider must be turnstile or recaptcha")
-        return normalized
-
-    @field_validator("captcha_secret", "captcha_bypass_token")
-    @classmethod
-    def trim_optional(cls, value: str | None) -> str | None:
-        if value is None:
-            return None
-        trimmed = value.strip()
-        return trimmed or None
+    def __post_init__(self) -> None:
+        if self.captcha_provider is not None:
+            normalized = self.captcha_provider.strip().lower()
+            if normalized not in CAPTCHA_PROVIDERS:
+                raise ValueError("captcha_provider must be turnstile or recaptcha")
+            object.__setattr__(self, "captcha_provider", normalized)
+        for name in ("captcha_secret", "captcha_bypass_token", "captcha_site_key"):
+            object.__setattr__(self, name, _trim_optional(getattr(self, name)))
 
-    @field_validator("captcha_site_key")
     @classmethod
-    def trim_site_key(cls, value: str | None) -> str | None:
-        if value is None:
-            return None
-        trimmed = value.strip()
-        return trimmed or None
-
-    model_config = SettingsConfigDict(
-        env_prefix="SUPER_CLIPBOARD_",
-        env_file=".env",
-        env_file_encoding="utf-8"
-    )
-
-
-settings = Settings()
-settings.file_storage_dir.mkdir(parents=True, exist_ok=True)
-settings.database_path.parent.mkdir(parents=True, exist_ok=True)
+    def from_env(
+        cls,
+        environ: Optional[Mapping[str, str]] = None,
+        env_file: Path = ENV_FILE,
+    ) -> "Settings":
+        source = {**_read_env_file(env_file), **(os.environ if environ is None else environ)}
+        values = {
+            key[len(ENV_PREFIX):].lower(): value
+            for key, value in source.items()
+            if key.upper().startswith(ENV_PREFIX)
+        }
+        kwargs: dict[str, object] = {}
+        for field in fields(cls):
+            raw = values.get(field.name)
+            if raw is None:
+                continue
+            cast = _CASTS.get(field.type)
+            try:
+                kwargs[field.name] = cast(raw) if cast else raw
+            except ValueError as error:
+                raise ValueError(f"{ENV_PREFIX}{field.name.upper()} is invalid: {raw!r}") from error
+        return cls(**kwargs)
+
+
+def ensure_storage_dirs(config: Settings) -> None:
+    # 两个目录默认同在 backend/storage 下，去重后逐个创建
+    for directory in dict.fromkeys((config.database_path.parent, config.file_storage_dir)):
+        os.makedirs(directory, exist_ok=True)
+
+
+settings = Settings.from_env()
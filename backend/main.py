@@ -1,92 +1,192 @@
 import asyncio
-from datetime import datetime, timezone
-from typing import Optional
-from fastapi import BackgroundTasks, FastAPI, HTTPException, Request
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, PlainTextResponse
+import os
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Annotated, AsyncIterator, Optional
+from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import FileResponse, ORJSONResponse, Response
 from fastapi.routing import APIRouter
-from fastapi.staticfiles import StaticFiles
-from .config import settings
-from .models import Clip
-from .repository import ClipRepository
+from pydantic import BaseModel, ValidationError
+from .config import ensure_storage_dirs, settings
+from .middleware import ClipDeletionScopeMiddleware, WildcardCORSMiddleware, deleted_clip_ids
+from .models import Clip, ClipMeta, StoredFile
+from .repository import ClipConflictError, ClipRepository, TokenNotRegisteredError
 from .schemas import (
     AppConfigResponse,
     ClipCreateRequest,
     ClipListResponse,
     ClipResponse,
+    ClipUploadQuery,
     DeleteResponse,
+    FileClipCreateRequest,
     IncrementResponse,
+    TextClipCreateRequest,
     TokenRegisterRequest,
     TokenRegisterResponse,
+    clip_create_adapter,
+    clip_row_to_item,
+    clip_url_prefixes,
+    inline_json_schema,
+)
+from .storage import FileTooLargeError, store_data_url, store_upload_stream
+from .utils import (
+    TEXT_CLIP_SLICE_CHARS,
+    build_base_url,
+    build_text_clip_html,
+    close_captcha_client,
+    stream_text_clip_html,
+    verify_captcha_token,
 )
-from .storage import store_data_url
-from .utils import build_base_url, build_text_clip_html, verify_captcha_token
 
 repository = ClipRepository(settings.database_path)
 api_router = APIRouter(prefix="/api")
-app = FastAPI(title="Super Clipboard Backend", version="0.1.0")
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
+
+
+def _scan_static_root(root: Path) -> Optional[dict[str, bool]]:
+    # 一次 scandir 同时确认目录存在、index.html 与 assets 子目录
+    try:
+        with os.scandir(root) as entries:
+            return {entry.name: entry.is_dir() for entry in entries}
+    except OSError:
+        return None
+
+
+_static_entries = _scan_static_root(settings.static_root)
+_INDEX_FILE: Optional[Path] = (
+    settings.static_root / "index.html"
+    if _static_entries is not None and _static_entries.get("index.html") is False
+    else None
 )
-if settings.static_root.exists():
-    app.mount("/static", StaticFiles(directory=settings.static_root), name="static")
-    assets_dir = settings.static_root / "assets"
-    if assets_dir.exists():
-        app.mount("/assets", StaticFiles(directory=assets_dir), name="assets")
 _cleanup_task: Optional[asyncio.Task] = None
+_startup_purge_task: Optional[asyncio.Task] = None
+_last_purge_monotonic: float = 0.0
+_purge_lock = asyncio.Lock()
+
+
+def _purge_now() -> None:
+    global _last_purge_monotonic
+    repository.purge_inactive()
+    _last_purge_monotonic = time.monotonic()
+
+
+async def _maybe_purge() -> None:
+    # 后台任务负责定期清理，请求路径上每个周期最多补充清理一次
+    if time.monotonic() - _last_purge_monotonic <= settings.cleanup_interval_seconds:
+        return
+    async with _purge_lock:
+        if time.monotonic() - _last_purge_monotonic <= settings.cleanup_interval_seconds:
+            return
+        _purge_now()
+
+
+def _delete_clip_once(clip_id: str, environment_id: str) -> bool:
+    # 同一请求内（含后台任务）同一片段只删除一次
+    handled = deleted_clip_ids.get()
+    if handled is not None:
+        if clip_id in handled:
+            return False
+        handled.add(clip_id)
+    return repository.delete_clip(clip_id, environment_id)
 
 
 async def cleanup_worker() -> None:
     while True:
         await asyncio.sleep(settings.cleanup_interval_seconds)
-        repository.purge_inactive()
+        _purge_now()
 
 
-@app.on_event("startup")
-async def on_startup() -> None:
-    repository.purge_inactive()
-    global _cleanup_task
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    global _cleanup_task, _startup_purge_task
+    ensure_storage_dirs(settings)
+    repository.initialize()
+    # 首次清理在后台线程进行，不推迟应用就绪
+    _startup_purge_task = asyncio.create_task(asyncio.to_thread(_purge_now))
     _cleanup_task = asyncio.create_task(cleanup_worker())
-
-
-@app.on_event("shutdown")
-async def on_shutdown() -> None:
-    if _cleanup_task:
+    try:
+        yield
+    finally:
         _cleanup_task.cancel()
         try:
             await _cleanup_task
         except asyncio.CancelledError:
             pass
+        # 线程中的清理无法中途取消，等它结束后再关闭连接；失败时由定期清理补上
+        await asyncio.gather(_startup_purge_task, return_exceptions=True)
+        await close_captcha_client()
+        repository.close()
+
+
+app = FastAPI(
+    title="Super Clipboard Backend",
+    version="0.1.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
+app.add_middleware(ClipDeletionScopeMiddleware)
+app.add_middleware(WildcardCORSMiddleware)
+if _static_entries is not None:
+    from fastapi.staticfiles import StaticFiles
+
+    app.mount("/static", StaticFiles(directory=settings.static_root, check_dir=False), name="static")
+    if _static_entries.get("assets"):
+        assets_dir = settings.static_root / "assets"
+        app.mount("/assets", StaticFiles(directory=assets_dir, check_dir=False), name="assets")
+
+
+class ModelJSONResponse(Response):
+    # 直接用 pydantic-core 把响应模型序列化为 JSON 字节，跳过 FastAPI 的 dump 与二次校验
+    media_type = "application/json"
+
+    def render(self, content: BaseModel) -> bytes:
+        return content.__pydantic_serializer__.to_json(content)
+
+
+class ClipFileResponse(FileResponse):
+    # 服务器支持 http.response.pathsend 时 Starlette 直接零拷贝发送，否则按 1 MiB 分块读取
+    chunk_size = 1024 * 1024
+
+
+def _stat_file(path: Path) -> Optional[os.stat_result]:
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        return None
+
+
+def normalized_environment_id(environmentId: str = Query(...)) -> str:
+    normalized = environmentId.strip()
+    if not normalized:
+        raise HTTPException(status_code=400, detail="environmentId 缺失")
+    return normalized
 
 
 @app.get("/healthz")
 async def healthcheck() -> dict[str, object]:
-    return {"ok": True, "timestamp": int(datetime.now(tz=timezone.utc).timestamp() * 1000)}
+    return {"ok": True, "timestamp": time.time_ns() // 1_000_000}
 
 
 @app.get("/")
 async def index():
-    index_file = settings.static_root / "index.html"
-    if index_file.exists():
-        return FileResponse(index_file)
-    return JSONResponse({"name": "Super Clipboard API", "ok": True})
+    if _INDEX_FILE is not None:
+        return FileResponse(_INDEX_FILE)
+    return ORJSONResponse({"name": "Super Clipboard API", "ok": True})
 
 
 @api_router.get("/clips", response_model=ClipListResponse)
-async def list_clips(request: Request, environmentId: str) -> ClipListResponse:
-    repository.purge_inactive()
-    base_url = build_base_url(request)
-    normalized_env = environmentId.strip()
-    if not normalized_env:
-        raise HTTPException(status_code=400, detail="environmentId 缺失")
-    clips = [
-        ClipResponse.from_clip(clip, base_url)
-        for clip in repository.list_clips(normalized_env)
+async def list_clips(
+    request: Request,
+    normalized_env: str = Depends(normalized_environment_id),
+) -> ORJSONResponse:
+    await _maybe_purge()
+    prefixes = clip_url_prefixes(build_base_url(request))
+    items = [
+        clip_row_to_item(row, prefixes)
+        for row in repository.list_clips_raw(normalized_env)
     ]
-    return ClipListResponse(items=clips)
+    return ORJSONResponse(content={"items": items})
 
 
 @api_router.post("/tokens/register", response_model=TokenRegisterResponse)
@@ -113,47 +213,75 @@ async def get_app_config() -> AppConfigResponse:
 
 
 @api_router.get("/clips/{clip_id}", response_model=ClipResponse)
-async def get_clip(clip_id: str, request: Request, environmentId: str) -> ClipResponse:
+async def get_clip(
+    clip_id: str,
+    request: Request,
+    normalized_env: str = Depends(normalized_environment_id),
+) -> ModelJSONResponse:
     clip = repository.get_clip(clip_id)
-    if not clip or clip.environment_id != environmentId:
+    if not clip or clip.environment_id != normalized_env:
         raise HTTPException(status_code=404, detail="片段未找到")
     if not clip.is_active:
-        repository.delete_clip(clip_id, environmentId)
+        _delete_clip_once(clip_id, normalized_env)
         raise HTTPException(status_code=404, detail="片段已过期或达到下载次数")
-    return ClipResponse.from_clip(clip, build_base_url(request))
+    return ModelJSONResponse(ClipResponse.from_clip(clip, build_base_url(request)))
 
 
 @api_router.get("/clips/code/{access_code}", response_model=ClipResponse)
-async def get_clip_by_code(access_code: str, request: Request) -> ClipResponse:
+async def get_clip_by_code(access_code: str, request: Request) -> ModelJSONResponse:
     clip = repository.get_clip_by_code(access_code)
     if not clip:
         raise HTTPException(status_code=404, detail="直链不存在或已过期")
     if not clip.is_active:
-        repository.delete_clip(clip.id, clip.environment_id)
+        _delete_clip_once(clip.id, clip.environment_id)
         raise HTTPException(status代码=404, detail="直链不存在或已过期")
-    return ClipResponse.from_clip(clip, build_base_url(request))
+    return ModelJSONResponse(ClipResponse.from_clip(clip, build_base_url(request)))
 
 
-def _resolve_text_payload(body: ClipCreateRequest) -> str:
-    return body.payload.text or ""
+def _resolve_text_payload(body: TextClipCreateRequest) -> str:
+    return body.payload.text
 
 
-def _resolve_file(body: ClipCreateRequest):
-    if not body.payload.file:
-        raise HTTPException(status_code=400, detail="文件数据缺失")
-    stored_file = store_data_url(body.payload.file.name, body.payload.file.dataUrl)
+async def _resolve_file(body: FileClipCreateRequest) -> StoredFile:
+    # base64 解码与写盘可能耗时较长，放到线程中避免阻塞事件循环
+    stored_file = await asyncio.to_thread(
+        store_data_url, body.payload.file.name, body.payload.file.dataUrl
+    )
     if stored_file.size > settings.max_file_size_bytes:
         stored_file.path.unlink(missing_ok=True)  # type: ignore[attr-defined]
         raise HTTPException(status_code=400, detail="文件体积超过限制")
     return stored_file
 
 
-@api_router.post("/clips", response_model=ClipResponse, status_code=201)
-async def create_clip(body: ClipCreateRequest, request: Request) -> ClipResponse:
-    environment_id_value = body.environmentId.strip()
-    if not environment_id_value:
-        raise HTTPException(status_code=400, detail="缺少 environmentId")
+# base64 膨胀约 4/3，另为 JSON 中的其他字段预留余量
+_CREATE_BODY_OVERHEAD_BYTES = 64 * 1024
 
+
+def _max_create_body_bytes() -> int:
+    return settings.max_file_size_bytes * 4 // 3 + _CREATE_BODY_OVERHEAD_BYTES
+
+
+async def _read_limited_body(request: Request, limit: int) -> bytes:
+    # 在 pydantic 解析前按大小拒绝过大的请求，避免为注定失败的上传读入并复制整段 data URL
+    declared = request.headers.get("content-length")
+    if declared is not None and declared.isdigit() and int(declared) > limit:
+        raise HTTPException(status_code=413, detail="文件体积超过限制")
+    chunks: list[bytes] = []
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > limit:
+            raise HTTPException(status_code=413, detail="文件体积超过限制")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def _authorize_creation(
+    request: Request,
+    environment_id: str,
+    captcha_token: Optional[str],
+    access_token: Optional[str],
+) -> None:
     if settings.captcha_provider:
         if not settings.captcha_secret:
             raise HTTPException(status_code=500, detail="验证码服务未正确配置")
@@ -162,7 +290,7 @@ async def create_clip(body: ClipCreateRequest, request: Request) -> ClipResponse
         if client_ip and client_ip.startswith(("127.", "10.", "192.168.", "172.")):
             client_ip = None
         await verify_captcha_token(
-            token=body.captchaToken,
+            token=captcha_token,
             provider=settings.captcha_provider,
             secret=settings.captcha_secret,
             remote_ip=client_ip,
@@ -170,42 +298,125 @@ async def create_clip(body: ClipCreateRequest, request: Request) -> ClipResponse
             bypass_token=settings.captcha_bypass_token,
         )
 
-    if body.accessToken:
+    if access_token:
         try:
-            repository.ensure_token_owner(body.accessToken, environment_id_value)
+            try:
+                repository.ensure_token_owner(access_token, environment_id)
+            except TokenNotRegisteredError:
+                repository.register_token(access_token, environment_id)
         except ValueError as error:
-            message = str(error)
-            if "未注册" in message or "未找到" in message:
-                repository.register_token(body.accessToken, environment_id_value)
-            else:
-                raise HTTPException(status_code=409, detail=message)
-
-    stored_file = None
+            raise HTTPException(status_code=409, detail=str(error))
+
+
+def _save_clip(
+    clip_type: str,
+    expires_at_ms: int,
+    max_downloads: Optional[int],
+    access_code: Optional[str],
+    access_token: Optional[str],
+    environment_id: str,
+    text: Optional[str],
+    stored_file: Optional[StoredFile],
+) -> Clip:
     try:
-        if body.type == "file":
-            stored_file = _resolve_file(body)
-        clip = repository.create_clip(
-            clip_type=body.type,
-            expires_at_ms=body.expiresAt,
-            max_downloads=body.maxDownloads,
-            access_code=body.accessCode,
-            access_token=body.accessToken,
-            environment_id=environment_id_value,
-            text=_resolve_text_payload(body) if body.type == "text" else None,
+        return repository.create_clip(
+            clip_type=clip_type,
+            expires_at_ms=expires_at_ms,
+            max_downloads=max_downloads,
+            access_code=access_code,
+            access_token=access_token,
+            environment_id=environment_id,
+            text=text,
             stored_file=stored_file,
         )
     except ValueError as error:
         if stored_file:
             stored_file.path.unlink(missing_ok=True)  # type: ignore[attr-defined]
-        message = str(error)
-        status = 409 if any(keyword in message for keyword in ("已存在", "Token")) else 400
-        raise HTTPException(status_code=status, detail=message)
-    return ClipResponse.from_clip(clip, build_base_url(request))
+        status = 409 if isinstance(error, ClipConflictError) else 400
+        raise HTTPException(status_code=status, detail=str(error))
+
+
+@api_router.post(
+    "/clips",
+    response_model=ClipResponse,
+    status_code=201,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": inline_json_schema(clip_create_adapter.json_schema())}},
+        }
+    },
+)
+async def create_clip(request: Request) -> ModelJSONResponse:
+    # 请求体可能携带较大的 data URL，直接交给 pydantic-core 解析 JSON 字节，省去中间 dict
+    raw_body = await _read_limited_body(request, _max_create_body_bytes())
+    try:
+        body: ClipCreateRequest = clip_create_adapter.validate_json(raw_body)
+    except ValidationError as error:
+        raise RequestValidationError(
+            [{**item, "loc": ("body", *item["loc"])} for item in error.errors(include_url=False)]
+        )
+    environment_id_value = body.environmentId
+
+    await _authorize_creation(request, environment_id_value, body.captchaToken, body.accessToken)
+
+    stored_file = None
+    text = None
+    if isinstance(body, FileClipCreateRequest):
+        try:
+            stored_file = await _resolve_file(body)
+        except ValueError as error:
+            raise HTTPException(status_code=400, detail=str(error))
+    else:
+        text = _resolve_text_payload(body)
+    clip = _save_clip(
+        clip_type=body.type,
+        expires_at_ms=body.expiresAt,
+        max_downloads=body.maxDownloads,
+        access_code=body.accessCode,
+        access_token=body.accessToken,
+        environment_id=environment_id_value,
+        text=text,
+        stored_file=stored_file,
+    )
+    return ModelJSONResponse(ClipResponse.from_clip(clip, build_base_url(request)), status_code=201)
+
+
+@api_router.post("/clips/upload", response_model=ClipResponse, status_code=201)
+async def upload_file_clip(
+    params: Annotated[ClipUploadQuery, Query()],
+    request: Request,
+) -> ModelJSONResponse:
+    await _authorize_creation(request, params.environmentId, params.captchaToken, params.accessToken)
+
+    content_type = request.headers.get("content-type", "").split(";", 1)[0].strip()
+    try:
+        stored_file = await store_upload_stream(
+            params.name,
+            content_type,
+            request.stream(),
+            settings.max_file_size_bytes,
+        )
+    except FileTooLargeError as error:
+        raise HTTPException(status_code=413, detail=str(error))
+    clip = _save_clip(
+        clip_type="file",
+        expires_at_ms=params.expiresAt,
+        max_downloads=params.maxDownloads,
+        access_code=params.accessCode,
+        access_token=params.accessToken,
+        environment_id=params.environmentId,
+        text=None,
+        stored_file=stored_file,
+    )
+    return ModelJSONResponse(ClipResponse.from_clip(clip, build_base_url(request)), status_code=201)
 
 
 @api_router.delete("/clips/{clip_id}", response_model=DeleteResponse)
-async def delete_clip(clip_id: str, environmentId: str) -> DeleteResponse:
-    normalized_env = environmentId.strip()
+async def delete_clip(
+    clip_id: str,
+    normalized_env: str = Depends(normalized_environment_id),
+) -> DeleteResponse:
     removed = repository.delete_clip(clip_id, normalized_env)
     if not removed:
         raise HTTPException(status_code=404, detail="片段未找到")
@@ -213,52 +424,52 @@ async def delete_clip(clip_id: str, environmentId: str) -> DeleteResponse:
 
 
 @api_router.post("/clips/{clip_id}/download", response_model=IncrementResponse)
-async def track_download(clip_id: str, request: Request, environmentId: str) -> IncrementResponse:
-    normalized_env = environmentId.strip()
+async def track_download(
+    clip_id: str,
+    request: Request,
+    normalized_env: str = Depends(normalized_environment_id),
+) -> ModelJSONResponse:
     clip, reached = repository.increment_downloads(clip_id, normalized_env)
     if not clip:
         raise HTTPException(status_code=404, detail="片段未找到")
     if not clip.is_active and reached:
-        repository.delete_clip(clip_id, normalized_env)
+        _delete_clip_once(clip_id, normalized_env)
         raise HTTPException(status_code=410, detail="片段已过期或销毁")
-    return IncrementResponse(
+    return ModelJSONResponse(IncrementResponse.model_construct(
         clip=ClipResponse.from_clip(clip, build_base_url(request)),
         removed=reached,
-    )
+    ))
 
 
 @api_router.get("/clips/{clip_id}/file")
 async def download_file(
     clip_id: str,
     background: BackgroundTasks,
-    environmentId: str,
-) -> FileResponse:
-    normalized_env = environmentId.strip()
-    clip = repository.get_clip(clip_id)
+    normalized_env: str = Depends(normalized_environment_id),
+) -> ClipFileResponse:
+    # 先在一次事务中完成校验与计数，失效的片段随后都会被删除，因此计数提前增加不影响结果
+    clip, reached = repository.increment_downloads(clip_id, normalized_env)
     if not clip:
         raise HTTPException(status_code=404, detail="片段未找到")
-    if clip.environment_id != normalized_env:
-        raise HTTPException(status_code=404, detail="片段未找到")
     if not clip.stored_file:
-        repository.delete_clip(clip_id, normalized_env)
+        _delete_clip_once(clip_id, normalized_env)
         raise HTTPException(status_code=410, detail="文件已丢失")
-    if not clip.is_active:
-        repository.delete_clip(clip_id, normalized_env)
+    if clip.is_expired or clip.download_count > clip.max_downloads:
+        _delete_clip_once(clip_id, normalized_env)
         raise HTTPException(status_code=410, detail="文件已过期或销毁")
     file_path = clip.stored_file.path
-    if not file_path.exists():
-        repository.delete_clip(clip_id, normalized_env)
+    stat_result = _stat_file(file_path)
+    if stat_result is None:
+        _delete_clip_once(clip_id, normalized_env)
         raise HTTPException(status_code=410, detail="文件已丢失")
-    clip, reached = repository.increment_downloads(clip_id, normalized_env)
-    if not clip:
-        raise HTTPException(status_code=404, detail="片段未找到")
     if reached:
-        background.add_task(repository.delete_clip, clip_id, normalized_env)
-    return FileResponse(
+        background.add_task(_delete_clip_once, clip_id, normalized_env)
+    return ClipFileResponse(
         path=file_path,
-        media_type=clip.stored_file.mime if clip.stored_file else "application/octet-stream",
-        filename=clip.stored_file.name if clip.stored_file else "clip",
+        media_type=clip.stored_file.mime,
+        filename=clip.stored_file.name,
         background=background,
+        stat_result=stat_result,
     )
 
 
@@ -272,31 +483,27 @@ def _parse_identifier(identifier: str) -> tuple[Optional[str], str]:
     return None, identifier.strip()
 
 
-def _get_active_clip(identifier: str) -> Clip:
+def _get_active_clip(identifier: str) -> ClipMeta:
     trimmed = identifier.strip()
     if not trimmed:
         raise HTTPException(status_code=404, detail="直链不存在或已过期")
-    clip: Optional[Clip] = repository.get_clip_by_code(trimmed)
-    owner_hint: Optional[str] = None
-    remainder = trimmed
-    if not clip:
-        owner_hint, remainder = _parse_identifier(trimmed)
-        if owner_hint and remainder:
-            if remainder.isdigit() and len(remainder) == 5:
-                clip = repository.get_clip_by_code_and_owner(remainder, owner_hint)
-            if not clip:
-                clip = repository.get_clip_by_token(remainder, owner_hint)
-    if not clip:
-        clip = repository.get_clip_by_token(trimmed)
+    owner_hint, remainder = _parse_identifier(trimmed)
+    owner_code: Optional[str] = None
+    owner_token: Optional[str] = None
+    if owner_hint and remainder:
+        if len(remainder) == 5 and remainder.isascii() and remainder.isdigit():
+            owner_code = remainder
+        owner_token = remainder
+    clip = repository.resolve_identifier(trimmed, owner_hint, owner_code, owner_token)
     if not clip:
         raise HTTPException(status_code=404, detail="直链不存在或已过期")
     if not clip.is_active:
-        repository.delete_clip(clip.id, clip.environment_id)
+        _delete_clip_once(clip.id, clip.environment_id)
         raise HTTPException(status_code=404, detail="直链不存在或已过期")
     return clip
 
 
-def _increment_clip_downloads(clip: Clip) -> tuple[Clip, bool]:
+def _increment_clip_downloads(clip: ClipMeta) -> tuple[Clip, bool]:
     updated_clip, reached = repository.increment_downloads(clip.id, clip.environment_id)
     if not updated_clip:
         raise HTTPException(status_code=404, detail="直链不存在或已过期")
@@ -309,32 +516,43 @@ def _dispatch_clip_response(
     background: BackgroundTasks,
     raw: bool,
 ):
+    from fastapi.responses import PlainTextResponse, StreamingResponse
+
     if clip.type == "text":
         if reached:
-            background.add_task(repository.delete_clip, clip.id, clip.environment_id)
+            background.add_task(_delete_clip_once, clip.id, clip.environment_id)
         if raw:
             return PlainTextResponse(content=clip.text or "")
+        text = clip.text or ""
+        if len(text) > TEXT_CLIP_SLICE_CHARS:
+            # 长文本分段转义并流式发送，不在内存中拼出整页
+            return StreamingResponse(
+                stream_text_clip_html(text, clip.created_at_ts, clip.download_count, clip.access_code),
+                media_type="text/html; charset=utf-8",
+            )
         html = build_text_clip_html(
-            clip.text or "",
-            clip.created_at,
+            text,
+            clip.created_at_ts,
             clip.download_count,
             clip.access_code,
         )
-        return HTMLResponse(content=html)
+        return Response(content=html, media_type="text/html; charset=utf-8")
     if clip.stored_file:
         if reached:
-            background.add_task(repository.delete_clip, clip.id, clip.environment_id)
+            background.add_task(_delete_clip_once, clip.id, clip.environment_id)
         file_path = clip.stored_file.path
-        if not file_path.exists():
-            repository.delete_clip(clip.id, clip.environment_id)
+        stat_result = _stat_file(file_path)
+        if stat_result is None:
+            _delete_clip_once(clip.id, clip.environment_id)
             raise HTTPException(status_code=410, detail="文件已丢失")
-        return FileResponse(
+        return ClipFileResponse(
             path=file_path,
             media_type=clip.stored_file.mime,
             filename=clip.stored_file.name,
             background=background,
+            stat_result=stat_result,
         )
-    repository.delete_clip(clip.id, clip.environment_id)
+    _delete_clip_once(clip.id, clip.environment_id)
     raise HTTPException(status_code=410, detail="文件数据缺失")
 
 
@@ -0,0 +1,71 @@
+from contextvars import ContextVar
+from typing import Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+_ALLOW_METHODS = b"DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT"
+_PREFLIGHT_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-methods", _ALLOW_METHODS),
+    (b"access-control-max-age", b"600"),
+]
+
+# 当前请求内已删除的片段 id，由 ClipDeletionScopeMiddleware 按请求初始化
+deleted_clip_ids: ContextVar[Optional[set[str]]] = ContextVar("deleted_clip_ids", default=None)
+
+
+class ClipDeletionScopeMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = deleted_clip_ids.set(set())
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            deleted_clip_ids.reset(token)
+
+
+# 等价于 allow_origins/methods/headers 全部为 "*" 的 CORSMiddleware，无 Origin 的请求直接放行
+class WildcardCORSMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        has_origin = False
+        request_method = None
+        request_headers = None
+        for key, value in scope["headers"]:
+            if key == b"origin":
+                has_origin = True
+            elif key == b"access-control-request-method":
+                request_method = value
+            elif key == b"access-control-request-headers":
+                request_headers = value
+        if not has_origin:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] == "OPTIONS" and request_method is not None:
+            headers = list(_PREFLIGHT_HEADERS)
+            if request_headers:
+                headers.append((b"access-control-allow-headers", request_headers))
+            await send({"type": "http.response.start", "status": 204, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_cors(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"access-control-allow-origin", b"*"),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
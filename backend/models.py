@@ -1,12 +1,12 @@
+import time
 from dataclasses import dataclass
-from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional
 
 ClipType = str
 
 
-@dataclass(slots=True)
+@dataclass(slots=True, frozen=True)
 class StoredFile:
     name: str
     size: int
@@ -14,12 +14,12 @@ class StoredFile:
     path: Path
 
 
-@dataclass(slots=True)
+@dataclass(slots=True, frozen=True)
 class Clip:
     id: str
     type: ClipType
-    created_at: datetime
-    expires_at: datetime
+    created_at_ts: int
+    expires_at_ts: int
     max_downloads: int
     download_count: int
     access_code: Optional[str]
@@ -30,7 +30,7 @@ class Clip:
 
     @property
     def is_expired(self) -> bool:
-        return datetime.now(tz=timezone.utc) >= self.expires_at
+        return time.time() >= self.expires_at_ts
 
     @property
     def reached_download_limit(self) -> bool:
@@ -39,3 +39,17 @@ class Clip:
     @property
     def is_active(self) -> bool:
         return not self.is_expired and not self.reached_download_limit
+
+
+@dataclass(slots=True, frozen=True)
+class ClipMeta:
+    # 只含归属与有效期信息，用于不需要正文的存在性与权限检查
+    id: str
+    environment_id: str
+    expires_at_ts: int
+    max_downloads: int
+    download_count: int
+
+    @property
+    def is_active(self) -> bool:
+        return time.time() < self.expires_at_ts and self.download_count < self.max_downloads
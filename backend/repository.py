@@ -1,12 +1,14 @@
 import sqlite3
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from datetime import datetime, timezone
 from pathlib import Path
-from threading import Lock
-from typing import Iterable, Optional
-from uuid import uuid4
+from secrets import token_hex
+from threading import Lock, local
+from typing import Iterator, Optional
 from .config import settings
-from .models import Clip, StoredFile
+from .models import Clip, ClipMeta, StoredFile
 
 
 CREATE_TABLE_SQL = """
@@ -29,6 +31,7 @@ CREATE TABLE IF NOT EXISTS clips (
 CREATE INDEX IF NOT EXISTS idx_clips_expires_at ON clips(expires_at);
 CREATE INDEX IF NOT EXISTS idx_clips_access_code ON clips(access_code);
 CREATE INDEX IF NOT EXISTS idx_clips_access_token ON clips(access_token);
+CREATE INDEX IF NOT EXISTS idx_clips_exhausted ON clips(id) WHERE download_count >= max_downloads;
 CREATE TABLE IF NOT EXISTS tokens (
     token TEXT PRIMARY KEY,
     owner_id TEXT NOT NULL,
@@ -39,25 +42,242 @@ CREATE TABLE IF NOT EXISTS tokens (
 CREATE INDEX IF NOT EXISTS idx_tokens_expires_at ON tokens(expires_at);
 """
 
+CLIP_COLUMNS = (
+    "id, type, created_at, expires_at, max_downloads, download_count, access_code, "
+    "access_token, owner_id, text_content, file_name, file_path, file_size, file_mime"
+)
+
+# 片段查询统一按 CLIP_COLUMNS 的顺序取列，行直接映射为具名元组，避免 sqlite3.Row 的按名查找
+ClipRow = namedtuple("ClipRow", CLIP_COLUMNS)
+
+
+def _clip_row_factory(cursor: sqlite3.Cursor, row: tuple) -> ClipRow:
+    return ClipRow._make(row)
+
+
+# 语句文本保持为模块常量，配合每线程连接命中 sqlite3 的预编译语句缓存
+INSERT_CLIP_SQL = f"""
+INSERT INTO clips ({CLIP_COLUMNS})
+VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+SELECT_CLIP_ID_BY_CODE_SQL = "SELECT id FROM clips WHERE access_code = ?"
+SELECT_CLIP_BY_CODE_SQL = f"SELECT {CLIP_COLUMNS} FROM clips WHERE access_code = ?"
+SELECT_CLIP_BY_ID_SQL = f"SELECT {CLIP_COLUMNS} FROM clips WHERE id = ?"
+LIST_ACTIVE_CLIPS_SQL = (
+    f"SELECT {CLIP_COLUMNS} FROM clips "
+    "WHERE owner_id = ? AND expires_at > ? AND download_count < max_downloads "
+    "ORDER BY created_at DESC"
+)
+SELECT_CLIP_FILE_SQL = "SELECT file_path, owner_id FROM clips WHERE id = ?"
+DELETE_CLIP_SQL = "DELETE FROM clips WHERE id = ?"
+INCREMENT_DOWNLOADS_SQL = (
+    "UPDATE clips SET download_count = download_count + 1 "
+    f"WHERE id = ? AND owner_id = ? RETURNING {CLIP_COLUMNS}"
+)
+
+CLIP_META_COLUMNS = "id, owner_id, expires_at, max_downloads, download_count"
+
+# 按优先级依次匹配：直链码、带归属前缀的直链码、带归属前缀的 Token、Token
+# 只取元信息列，正文由随后的下载计数 UPDATE ... RETURNING 一并返回
+RESOLVE_IDENTIFIER_SQL = f"""
+SELECT {CLIP_META_COLUMNS} FROM (
+    SELECT 0 AS priority, created_at, {CLIP_META_COLUMNS} FROM clips WHERE access_code = :identifier
+    UNION ALL
+    SELECT 1 AS priority, created_at, {CLIP_META_COLUMNS} FROM clips
+    WHERE :owner_code IS NOT NULL AND access_code = :owner_code AND owner_id = :owner
+    UNION ALL
+    SELECT 2 AS priority, created_at, {CLIP_META_COLUMNS} FROM clips
+    WHERE :owner_token IS NOT NULL AND access_token = :owner_token AND owner_id = :owner
+    UNION ALL
+    SELECT 3 AS priority, created_at, {CLIP_META_COLUMNS} FROM clips WHERE access_token = :identifier
+)
+ORDER BY priority, created_at DESC
+LIMIT 1
+"""
+
+# 一条 UPSERT 完成注册与续期：已过期的 Token 可被重新分配，未过期时只允许原归属续期，否则不更新也不返回行
+REGISTER_TOKEN_SQL = """
+INSERT INTO tokens (token, owner_id, updated_at, last_used_at, expires_at)
+VALUES (:token, :insert_owner, :now, NULL, :expires_at)
+ON CONFLICT(token) DO UPDATE SET
+    owner_id = CASE
+        WHEN tokens.expires_at > :now OR tokens.owner_id = :owner THEN tokens.owner_id
+        ELSE :fresh_owner
+    END,
+    updated_at = excluded.updated_at,
+    last_used_at = CASE WHEN tokens.expires_at <= :now THEN NULL ELSE tokens.last_used_at END,
+    expires_at = excluded.expires_at
+WHERE tokens.expires_at <= :now OR tokens.owner_id = :owner
+RETURNING owner_id, last_used_at
+"""
+
+PURGE_BATCH_SIZE = 1000
+LIST_FETCH_SIZE = 256
+PURGE_BATCH_SQL = """
+DELETE FROM clips WHERE id IN (
+    SELECT id FROM clips WHERE expires_at <= ?
+    UNION
+    SELECT id FROM clips WHERE download_count >= max_downloads
+    LIMIT ?
+)
+RETURNING id, file_path
+"""
+
+
+class ClipConflictError(ValueError):
+    pass
+
+
+class TokenConflictError(ValueError):
+    pass
+
+
+class TokenNotRegisteredError(ValueError):
+    pass
+
+
+def _safe_unlink(path: str) -> None:
+    try:
+        Path(path).unlink(missing_ok=True)
+    except OSError:
+        pass
+
+
+def _clip_meta(clip: Clip) -> ClipMeta:
+    return ClipMeta(
+        clip.id,
+        clip.environment_id,
+        clip.expires_at_ts,
+        clip.max_downloads,
+        clip.download_count,
+    )
+
+
+class ClipLookupCache:
+    # 直链查询的进程内 LRU 缓存，只保存元信息不保存正文；写操作负责失效或回写，条目另有 TTL 兜底
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 30.0):
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[tuple, tuple[float, ClipMeta]] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: tuple) -> Optional[ClipMeta]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            cached_at, meta = entry
+            if time.monotonic() - cached_at > self._ttl_seconds or not meta.is_active:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return meta
+
+    def put(self, key: tuple, meta: ClipMeta) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), meta)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def replace(self, meta: ClipMeta) -> None:
+        with self._lock:
+            for key, (cached_at, cached) in self._entries.items():
+                if cached.id == meta.id:
+                    self._entries[key] = (cached_at, meta)
+
+    def discard(self, *clip_ids: str) -> None:
+        if not clip_ids or not self._entries:
+            return
+        targets = set(clip_ids)
+        with self._lock:
+            stale = [key for key, (_, cached) in self._entries.items() if cached.id in targets]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
 
 class ClipRepository:
     def __init__(self, database_path: Path):
         self._database_path = database_path
-        self._lock = Lock()
-        self._ensure_schema()
+        # 读操作依赖 WAL 并发，不加进程锁；该锁只串行化写事务，减少 BEGIN IMMEDIATE 的忙等
+        self._write_lock = Lock()
+        self._local = local()
+        self._lookup_cache = ClipLookupCache()
+        self._connections_lock = Lock()
+        self._open_connections: list[sqlite3.Connection] = []
+        self._unlink_pool: Optional[ThreadPoolExecutor] = None
+
+    def _get_conn(self) -> sqlite3.Connection:
+        # 每个线程复用一个自动提交模式的连接，写操作通过 _transaction 显式开启事务
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self._database_path,
+                check_same_thread=False,
+                isolation_level=None,
+                uri=str(self._database_path).startswith("file:"),
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA cache_size=-20000")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._open_connections.append(conn)
+        return conn
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        yield self._get_conn()
 
     @contextmanager
-    def _connection(self) -> Iterable[sqlite3.Connection]:
-        conn = sqlite3.connect(self._database_path, check_same_thread=False)
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._get_conn()
+        conn.execute("BEGIN IMMEDIATE")
         try:
-            conn.row_factory = sqlite3.Row
             yield conn
-            conn.commit()
-        finally:
+            conn.execute("COMMIT")
+        except BaseException:
+            # 连接按线程复用，提交失败也必须回滚，否则该线程后续 BEGIN 全部失败
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+    def _discard_files(self, file_paths: list[str]) -> None:
+        # 文件删除交给后台线程，事务提交后立即返回
+        if not file_paths:
+            return
+        with self._connections_lock:
+            if self._unlink_pool is None:
+                self._unlink_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="clip-unlink")
+            pool = self._unlink_pool
+        for file_path in file_paths:
+            pool.submit(_safe_unlink, file_path)
+
+    def close(self) -> None:
+        with self._connections_lock:
+            connections, self._open_connections = self._open_connections, []
+            self._local = local()
+            pool, self._unlink_pool = self._unlink_pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+        for conn in connections:
             conn.close()
 
-    def _ensure_schema(self) -> None:
+    def _is_memory_database(self) -> bool:
+        path = str(self._database_path)
+        return path == ":memory:" or (path.startswith("file:") and "mode=memory" in path)
+
+    def initialize(self) -> None:
         with self._connection() as conn:
+            # WAL 下读写互不阻塞；内存数据库不支持 WAL
+            if not self._is_memory_database():
+                conn.execute("PRAGMA journal_mode=WAL")
             conn.executescript(CREATE_TABLE_SQL)
             columns = {row["name"] for row in conn.execute("PRAGMA table_info(clips)")}
             if "owner_id" not in columns:
@@ -71,46 +291,30 @@ class ClipRepository:
         trimmed = token.strip()
         if not trimmed:
             raise ValueError("持久 Token 无效")
-        now = int(datetime.now(tz=timezone.utc).timestamp())
+        now = int(time.time())
         ttl_seconds = self._token_ttl_seconds()
         expires_at = now + ttl_seconds
-        last_used_at_value: Optional[int] = None
-        with self._lock, self._connection() as conn:
+        requested_owner = environment_id or None
+        fresh_owner = token_hex(16)
+        with self._write_lock, self._transaction() as conn:
             row = conn.execute(
-                "SELECT owner_id, updated_at, last_used_at, expires_at FROM tokens WHERE token = ?",
-                (trimmed,)
+                REGISTER_TOKEN_SQL,
+                {
+                    "token": trimmed,
+                    "owner": requested_owner,
+                    "insert_owner": requested_owner or fresh_owner,
+                    "fresh_owner": fresh_owner,
+                    "now": now,
+                    "expires_at": expires_at,
+                }
             ).fetchone()
-            if row:
-                if row["expires_at"] <= now:
-                    assigned_owner = environment_id if environment_id and environment_id == row["owner_id"] else str(uuid4())
-                    conn.execute(
-                        "UPDATE tokens SET owner_id = ?, updated_at = ?, last_used_at = NULL, expires_at = ? WHERE token = ?",
-                        (assigned_owner, now, expires_at, trimmed)
-                    )
-                    last_used_at_value = None
-                else:
-                    existing_owner = row["owner_id"]
-                    if environment_id and environment_id == existing_owner:
-                        conn.execute(
-                            "UPDATE tokens SET updated_at = ?, expires_at = ? WHERE token = ?",
-                            (now, expires_at, trimmed)
-                        )
-                        assigned_owner = existing_owner
-                        last_used_at_value = row["last_used_at"]
-                    else:
-                        raise ValueError("持久 Token 已被其他设备占用，请稍后重试")
-            else:
-                assigned_owner = environment_id if environment_id else str(uuid4())
-                conn.execute(
-                    "INSERT INTO tokens (token, owner_id, updated_at, last_used_at, expires_at) VALUES (?, ?, ?, NULL, ?)",
-                    (trimmed, assigned_owner, now, expires_at)
-                )
-                last_used_at_value = None
+        if not row:
+            raise TokenConflictError("持久 Token 已被其他设备占用，请稍后重试")
         return {
             "token": trimmed,
-            "environment_id": assigned_owner,
+            "environment_id": row["owner_id"],
             "updated_at": now,
-            "last_used_at": last_used_at_value,
+            "last_used_at": row["last_used_at"],
             "expires_at": expires_at,
         }
 
@@ -121,21 +325,21 @@ class ClipRepository:
         normalized_env = environment_id.strip()
         if not normalized_env:
             raise ValueError("Token 校验失败")
-        now = int(datetime.now(tz=timezone.utc).timestamp())
+        now = int(time.time())
         ttl_seconds = self._token_ttl_seconds()
         new_expires = now + ttl_seconds
-        with self._lock, self._connection() as conn:
+        with self._write_lock, self._transaction() as conn:
             row = conn.execute(
                 "SELECT owner_id, updated_at, last_used_at, expires_at FROM tokens WHERE token = ?",
                 (trimmed,)
             ).fetchone()
             if not row:
-                raise ValueError("持久 Token 未注册，请重新保存")
+                raise TokenNotRegisteredError("持久 Token 未注册，请重新保存")
             if row["expires_at"] <= now:
                 conn.execute("DELETE FROM tokens WHERE token = ?", (trimmed,))
                 raise ValueError("持久 Token 已过期，请重新生成")
             if row["owner_id"] != normalized_env:
-                raise ValueError("持久 Token 已被其他设备占用，请稍后重试")
+                raise TokenConflictError("持久 Token 已被其他设备占用，请稍后重试")
             conn.execute(
                 "UPDATE tokens SET last_used_at = ?, expires_at = ? WHERE token = ?",
                 (now, new_expires, trimmed)
@@ -148,28 +352,32 @@ class ClipRepository:
             "expires_at": new_expires,
         }
 
-    def _row_to_clip(self, row: sqlite3.Row) -> Clip:
-        file_path = row["file_path"]
+    def _fetch_clip_row(self, conn: sqlite3.Connection, sql: str, params) -> Optional[ClipRow]:
+        cursor = conn.cursor()
+        cursor.row_factory = _clip_row_factory
+        return cursor.execute(sql, params).fetchone()
+
+    def _row_to_clip(self, row: ClipRow) -> Clip:
+        file_path = row.file_path
         stored_file = None
         if file_path:
             stored_file = StoredFile(
-                name=row["file_name"],
-                size=row["file_size"],
-                mime=row["file_mime"],
+                name=row.file_name,
+                size=row.file_size,
+                mime=row.file_mime,
                 path=Path(file_path)
             )
-        owner_id = row["owner_id"] if "owner_id" in row.keys() else ""
         return Clip(
-            id=row["id"],
-            type=row["type"],
-            created_at=datetime.fromtimestamp(row["created_at"], tz=timezone.utc),
-            expires_at=datetime.fromtimestamp(row["expires_at"], tz=timezone.utc),
-            max_downloads=row["max_downloads"],
-            download_count=row["download_count"],
-            access_code=row["access_code"],
-            access_token=row["access_token"],
-            environment_id=owner_id,
-            text=row["text_content"],
+            id=row.id,
+            type=row.type,
+            created_at_ts=row.created_at,
+            expires_at_ts=row.expires_at,
+            max_downloads=row.max_downloads,
+            download_count=row.download_count,
+            access_code=row.access_code,
+            access_token=row.access_token,
+            environment_id=row.owner_id or "",
+            text=row.text_content,
             stored_file=stored_file
         )
 
@@ -190,38 +398,31 @@ class ClipRepository:
         text: Optional[str],
         stored_file: Optional[StoredFile]
     ) -> Clip:
-        expires_at = datetime.fromtimestamp(expires_at_ms / 1000, tz=timezone.utc)
-        if expires_at <= datetime.now(tz=timezone.utc):
+        now_ms = time.time_ns() // 1_000_000
+        if expires_at_ms <= now_ms:
             raise ValueError("过期时间必须晚于当前时间")
 
         environment_id_value = environment_id.strip()
         if not environment_id_value:
             raise ValueError("剪贴板所属标识缺失")
-        with self._lock, self._connection() as conn:
+        with self._write_lock, self._transaction() as conn:
             if access_code:
-                existing = conn.execute(
-                    "SELECT id FROM clips WHERE access_code = ?",
-                    (access_code,)
-                ).fetchone()
+                existing = conn.execute(SELECT_CLIP_ID_BY_CODE_SQL, (access_code,)).fetchone()
                 if existing:
-                    raise ValueError("直链码已存在，请刷新后再试")
+                    raise ClipConflictError("直链码已存在，请刷新后再试")
 
-            clip_id = str(uuid4())
-            created_at = datetime.now(tz=timezone.utc)
+            clip_id = token_hex(16)
+            created_at_ts = now_ms // 1000
+            expires_at_ts = expires_at_ms // 1000
+            max_downloads_value = self.sanitize_max_downloads(max_downloads)
             conn.execute(
-                """
-                INSERT INTO clips (
-                    id, type, created_at, expires_at, max_downloads,
-                    download_count, access_code, access_token, owner_id, text_content,
-                    file_name, file_path, file_size, file_mime
-                ) VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
+                INSERT_CLIP_SQL,
                 (
                     clip_id,
                     clip_type,
-                    int(created_at.timestamp()),
-                    int(expires_at.timestamp()),
-                    self.sanitize_max_downloads(max_downloads),
+                    created_at_ts,
+                    expires_at_ts,
+                    max_downloads_value,
                     access_code,
                     access_token,
                     environment_id_value,
@@ -232,109 +433,127 @@ class ClipRepository:
                     stored_file.mime if stored_file else None
                 )
             )
-            row = conn.execute(
-                "SELECT * FROM clips WHERE id = ?",
-                (clip_id,)
-            ).fetchone()
-        return self._row_to_clip(row)
+        # 新片段可能改变 Token 的最新匹配结果，直接清空缓存
+        self._lookup_cache.clear()
+        return Clip(
+            id=clip_id,
+            type=clip_type,
+            created_at_ts=created_at_ts,
+            expires_at_ts=expires_at_ts,
+            max_downloads=max_downloads_value,
+            download_count=0,
+            access_code=access_code,
+            access_token=access_token,
+            environment_id=environment_id_value,
+            text=text,
+            stored_file=stored_file
+        )
 
-    def list_clips(self, environment_id: str) -> list[Clip]:
+    def list_clips_raw(self, environment_id: str) -> Iterator[tuple]:
+        # 请求路径上的清理已节流，这里直接过滤掉已过期或下载次数用尽的片段
+        now_ts = int(time.time())
         with self._connection() as conn:
-            rows = conn.execute(
-                "SELECT * FROM clips WHERE owner_id = ? ORDER BY created_at DESC",
-                (environment_id,)
-            ).fetchall()
-        return [self._row_to_clip(row) for row in rows]
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            try:
+                cursor.execute(LIST_ACTIVE_CLIPS_SQL, (environment_id, now_ts))
+                # 分批取行，片段较多时不必一次性物化整个结果集
+                while True:
+                    rows = cursor.fetchmany(LIST_FETCH_SIZE)
+                    if not rows:
+                        return
+                    yield from rows
+            finally:
+                cursor.close()
 
     def get_clip_by_code(self, access_code: str) -> Optional[Clip]:
+        # 缓存只记录直链码对应的片段 ID，正文每次按主键重新读取
+        cache_key = ("code", access_code)
+        cached = self._lookup_cache.get(cache_key)
         with self._connection() as conn:
-            row = conn.execute(
-                "SELECT * FROM clips WHERE access_code = ?",
-                (access_code,)
-            ).fetchone()
-        return self._row_to_clip(row) if row else None
-
-    def get_clip_by_code_and_owner(self, access_code: str, environment_id: str) -> Optional[Clip]:
-        with self._connection() as conn:
-            row = conn.execute(
-                "SELECT * FROM clips WHERE access_code = ? AND owner_id = ?",
-                (access_code, environment_id)
-            ).fetchone()
-        return self._row_to_clip(row) if row else None
+            if cached is not None:
+                row = self._fetch_clip_row(conn, SELECT_CLIP_BY_ID_SQL, (cached.id,))
+            else:
+                row = self._fetch_clip_row(conn, SELECT_CLIP_BY_CODE_SQL, (access_code,))
+        if not row:
+            return None
+        clip = self._row_to_clip(row)
+        if cached is None:
+            self._lookup_cache.put(cache_key, _clip_meta(clip))
+        return clip
 
     def get_clip(self, clip_id: str) -> Optional[Clip]:
         with self._connection() as conn:
-            row = conn.execute(
-                "SELECT * FROM clips WHERE id = ?",
-                (clip_id,)
-            ).fetchone()
+            row = self._fetch_clip_row(conn, SELECT_CLIP_BY_ID_SQL, (clip_id,))
         return self._row_to_clip(row) if row else None
 
-    def get_clip_by_token(self, access_token: str, environment_id: Optional[str] = None) -> Optional[Clip]:
+    def resolve_identifier(
+        self,
+        identifier: str,
+        owner_hint: Optional[str] = None,
+        owner_code: Optional[str] = None,
+        owner_token: Optional[str] = None,
+    ) -> Optional[ClipMeta]:
+        cache_key = ("resolve", identifier, owner_hint, owner_code, owner_token)
+        cached = self._lookup_cache.get(cache_key)
+        if cached is not None:
+            return cached
         with self._connection() as conn:
-            if environment_id:
-                row = conn.execute(
-                    "SELECT * FROM clips WHERE access_token = ? AND owner_id = ? ORDER BY created_at DESC",
-                    (access_token, environment_id)
-                ).fetchone()
-            else:
-                row = conn.execute(
-                    "SELECT * FROM clips WHERE access_token = ? ORDER BY created_at DESC",
-                    (access_token,)
-                ).fetchone()
-        return self._row_to_clip(row) if row else None
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            row = cursor.execute(
+                RESOLVE_IDENTIFIER_SQL,
+                {
+                    "identifier": identifier,
+                    "owner": owner_hint,
+                    "owner_code": owner_code,
+                    "owner_token": owner_token,
+                }
+            ).fetchone()
+        if not row:
+            return None
+        clip = ClipMeta(*row)
+        self._lookup_cache.put(cache_key, clip)
+        return clip
 
     def delete_clip(self, clip_id: str, environment_id: str) -> bool:
         normalized_env = environment_id.strip()
         if not normalized_env:
             return False
-        with self._lock, self._connection() as conn:
-            row = conn.execute(
-                "SELECT file_path, owner_id FROM clips WHERE id = ?",
-                (clip_id,)
-            ).fetchone()
+        with self._write_lock, self._transaction() as conn:
+            row = conn.execute(SELECT_CLIP_FILE_SQL, (clip_id,)).fetchone()
             if not row or row["owner_id"] != normalized_env:
                 return False
             file_path = row["file_path"]
-            conn.execute("DELETE FROM clips WHERE id = ?", (clip_id,))
+            conn.execute(DELETE_CLIP_SQL, (clip_id,))
+        self._lookup_cache.discard(clip_id)
         if file_path:
-            Path(file_path).unlink(missing_ok=True)
+            self._discard_files([file_path])
         return True
 
     def increment_downloads(self, clip_id: str, environment_id: str) -> tuple[Optional[Clip], bool]:
         normalized_env = environment_id.strip()
         if not normalized_env:
             return None, False
-        with self._lock, self._connection() as conn:
-            row = conn.execute(
-                "SELECT * FROM clips WHERE id = ?",
-                (clip_id,)
-            ).fetchone()
-            if not row:
-                return None, False
-            clip = self._row_to_clip(row)
-            if clip.environment_id != normalized_env:
-                return None, False
-            new_count = clip.download_count + 1
-            conn.execute(
-                "UPDATE clips SET download_count = ? WHERE id = ?",
-                (new_count, clip_id)
-            )
-            clip.download_count = new_count
-            reached_limit = new_count >= clip.max_downloads
+        # 单条原子 UPDATE，由 SQLite 自身的写锁保证并发安全，无需进程锁
+        with self._transaction() as conn:
+            row = self._fetch_clip_row(conn, INCREMENT_DOWNLOADS_SQL, (clip_id, normalized_env))
+        if not row:
+            return None, False
+        clip = self._row_to_clip(row)
+        self._lookup_cache.replace(_clip_meta(clip))
+        reached_limit = clip.download_count >= clip.max_downloads
         return clip, reached_limit
 
     def purge_inactive(self) -> int:
-        now_ts = int(datetime.now(tz=timezone.utc).timestamp())
-        with self._lock, self._connection() as conn:
-            rows = conn.execute(
-                "SELECT id, file_path FROM clips WHERE expires_at <= ? OR download_count >= max_downloads",
-                (now_ts,)
-            ).fetchall()
-            ids = [row["id"] for row in rows]
-            conn.executemany("DELETE FROM clips WHERE id = ?", ((clip_id,) for clip_id in ids))
-        for row in rows:
-            file_path = row["file_path"]
-            if file_path:
-                Path(file_path).unlink(missing_ok=True)
-        return len(rows)
+        now_ts = int(time.time())
+        removed = 0
+        while True:
+            # 分批删除，避免大量过期片段长时间占用写锁
+            with self._write_lock, self._transaction() as conn:
+                rows = conn.execute(PURGE_BATCH_SQL, (now_ts, PURGE_BATCH_SIZE)).fetchall()
+            self._lookup_cache.discard(*(row["id"] for row in rows))
+            self._discard_files([row["file_path"] for row in rows if row["file_path"]])
+            removed += len(rows)
+            if len(rows) < PURGE_BATCH_SIZE:
+                return removed
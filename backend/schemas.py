@@ -1,99 +1,122 @@
-from datetime import datetime
-from typing import Literal, Optional
-from uuid import UUID
-from pydantic import BaseModel, Field, field_validator, model_validator
+from functools import lru_cache
+from typing import Annotated, Literal, NamedTuple, Optional, Union
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints, TypeAdapter
 from .models import Clip
 
+# 去空白与格式校验交给 pydantic-core 的原生约束，不再逐字段回调 Python
+AccessCode = Annotated[str, StringConstraints(strip_whitespace=True, min_length=5, max_length=12, pattern=r"^[^\W_]+$")]
+PersistentToken = Annotated[str, StringConstraints(strip_whitespace=True, min_length=7)]
+# 空白验证码在去空白后为空串，verify_captcha_token 会按缺失处理
+CaptchaToken = Annotated[str, StringConstraints(strip_whitespace=True, max_length=4096)]
+CaptchaProvider = Literal["turnstile", "recaptcha"]
+OwnerId = Annotated[str, StringConstraints(strip_whitespace=True, min_length=1, max_length=64)]
 
-class StoredFileInput(BaseModel):
+
+class ApiModel(BaseModel):
+    # 校验器推迟到首次使用（路由注册或 TypeAdapter）时再构建，缩短 schemas 模块的导入时间
+    model_config = ConfigDict(extra="ignore", defer_build=True)
+
+
+class StoredFileInput(ApiModel):
     name: str = Field(min_length=1, max_length=255)
     size: int = Field(ge=0)
     type: str = Field(default="", max_length=255)
-    dataUrl: str = Field(min_length=1)
+    dataUrl: str = Field(min_length=1, pattern=r"^data:")
 
-    @field_validator("dataUrl")
-    @classmethod
-    def ensure_data_url(cls, value: str) -> str:
-        if not value.startswith("data:"):
-            raise ValueError("file dataUrl must be a base64 data URI")
-        return value
 
+class TextPayloadInput(ApiModel):
+    text: str = Field(pattern=r"\S")
+    file: None = None
 
-class ClipPayloadInput(BaseModel):
-    text: Optional[str] = None
-    file: Optional[StoredFileInput] = None
 
-class ClipCreateRequest(BaseModel):
-    type: Literal["text", "file"]
+class FilePayloadInput(ApiModel):
+    file: StoredFileInput
+    text: None = None
+
+
+class ClipCreateBase(ApiModel):
     expiresAt: int = Field(gt=0)
     maxDownloads: Optional[int] = Field(default=None, gt=0)
-    accessCode: Optional[str] = Field(default=None, min_length=5, max_length=12)
-    accessToken: Optional[str] = Field(default=None, min_length=7)
-    environmentId: str = Field(min_length=1, max_length=64)
-    payload: ClipPayloadInput
-    captchaToken: Optional[str] = Field(default=None, min_length=1, max_length=4096)
-    captchaProvider: Optional[Literal["turnstile", "recaptcha"]] = Field(default=None)
-
-    @field_validator("accessCode")
-    @classmethod
-    def ensure_access_code(cls, value: Optional[str]) -> Optional[str]:
-        if value is None:
-            return value
-        trimmed = value.strip()
-        if not trimmed:
-            return None
-        if not trimmed.isalnum():
-            raise ValueError("直链码需由字母或数字组成")
-        return trimmed
-
-    @field_validator("accessToken")
-    @classmethod
-    def ensure_access_token(cls, value: Optional[str]) -> Optional[str]:
-        if value is None:
-            return value
-        return value.strip()
+    accessCode: Optional[AccessCode] = None
+    accessToken: Optional[PersistentToken] = None
+    environmentId: OwnerId
+    captchaToken: Optional[CaptchaToken] = None
+    captchaProvider: Optional[CaptchaProvider] = Field(default=None)
 
-    @field_validator("captchaToken")
-    @classmethod
-    def trim_captcha_token(cls, value: Optional[str]) -> Optional[str]:
-        if value is None:
-            return value
-        trimmed = value.strip()
-        return trimmed or None
-
-    @model_validator(mode="after")
-    def validate_payload(self) -> "ClipCreateRequest":
-        if self.type == "text":
-            if not self.payload.text or not self.payload.text.strip():
-                raise ValueError("文本片段需要 text 字段")
-            if self.payload.file is not None:
-                raise ValueError("文本片段不应包含文件数据")
-        elif self.type == "file":
-            if self.payload.file is None:
-                raise ValueError("文件片段需要 file 数据")
-            if self.payload.text is not None:
-                raise ValueError("文件片段不应包含文本字段")
-        if self.accessToken and not self.environmentId.strip():
-            raise ValueError("持久 Token 校验失败，请重新保存")
-        if not self.environmentId.strip():
-            raise ValueError("environmentId 缺失")
-        return self
-
-
-class StoredFileResponse(BaseModel):
+
+class TextClipCreateRequest(ClipCreateBase):
+    type: Literal["text"]
+    payload: TextPayloadInput
+
+
+class FileClipCreateRequest(ClipCreateBase):
+    type: Literal["file"]
+    payload: FilePayloadInput
+
+
+# 以顶层 type 为判别字段，由 pydantic-core 直接分派到对应载荷模型，不再需要 after 校验器
+ClipCreateRequest = Annotated[
+    Union[TextClipCreateRequest, FileClipCreateRequest],
+    Field(discriminator="type"),
+]
+clip_create_adapter: TypeAdapter[ClipCreateRequest] = TypeAdapter(ClipCreateRequest)
+
+
+class ClipUploadQuery(ClipCreateBase):
+    # 二进制上传时元数据放在查询参数中，请求体即文件内容
+    name: str = Field(min_length=1, max_length=255)
+
+
+def inline_json_schema(schema: dict[str, object]) -> dict[str, object]:
+    # 供 openapi_extra 使用：把 $defs 引用展开，避免文档中出现无法解析的局部引用
+    schema = dict(schema)
+    definitions = schema.pop("$defs", {})
+
+    def resolve(node):
+        if isinstance(node, dict):
+            ref = node.get("$ref")
+            if isinstance(ref, str) and ref.startswith("#/$defs/"):
+                return resolve(definitions[ref[len("#/$defs/"):]])
+            resolved = {key: resolve(value) for key, value in node.items()}
+            discriminator = resolved.get("discriminator")
+            if isinstance(discriminator, dict) and "propertyName" in discriminator and "mapping" in discriminator:
+                # 判别映射指向 $defs，展开后已无意义；只删除判别对象内的 mapping
+                resolved["discriminator"] = {
+                    key: value for key, value in discriminator.items() if key != "mapping"
+                }
+            return resolved
+        if isinstance(node, list):
+            return [resolve(item) for item in node]
+        return node
+
+    return resolve(schema)
+
+
+class ClipUrlPrefixes(NamedTuple):
+    file: str
+    direct: str
+
+
+@lru_cache(maxsize=16)
+def clip_url_prefixes(base_url: str) -> ClipUrlPrefixes:
+    # 同一站点的链接前缀只拼接一次，逐条片段只追加 id 与直链码
+    return ClipUrlPrefixes(file=f"{base_url}/api/clips/", direct=f"{base_url}/")
+
+
+class StoredFileResponse(ApiModel):
     name: str
     size: int
     type: str
     downloadUrl: str
 
 
-class ClipPayloadResponse(BaseModel):
+class ClipPayloadResponse(ApiModel):
     text: Optional[str]
     file: Optional[StoredFileResponse]
 
 
-class ClipResponse(BaseModel):
-    id: UUID
+class ClipResponse(ApiModel):
+    id: str
     type: Literal["text", "file"]
     createdAt: int
     expiresAt: int
@@ -104,75 +127,84 @@ class ClipResponse(BaseModel):
     payload: ClipPayloadResponse
     directUrl: Optional[str]
 
-    @staticmethod
-    def from_clip(clip: Clip, base_url: str) -> "ClipResponse":
+    @classmethod
+    def from_clip(cls, clip: Clip, base_url: str) -> "ClipResponse":
+        prefixes = clip_url_prefixes(base_url)
         file_payload = None
         if clip.stored_file:
-            file_payload = StoredFileResponse(
+            file_payload = StoredFileResponse.model_construct(
                 name=clip.stored_file.name,
                 size=clip.stored_file.size,
                 type=clip.stored_file.mime,
-                downloadUrl=f"{base_url}/api/clips/{clip.id}/file?environmentId={clip.environment_id}"
+                downloadUrl=f"{prefixes.file}{clip.id}/file?environmentId={clip.environment_id}"
             )
-        direct_url = (
-            f"{base_url}/{clip.access_code}" if clip.access_code else None
-        )
-        return ClipResponse(
-            id=UUID(clip.id),
-            type=clip.type,
-            createdAt=int(clip.created_at.timestamp() * 1000),
-            expiresAt=int(clip.expires_at.timestamp() * 1000),
-            maxDownloads=clip.max_downloads,
-            downloadCount=clip.download_count,
-            accessCode=clip.access_code,
-            accessToken=clip.access_token,
-            payload=ClipPayloadResponse(text=clip.text, file=file_payload),
-            directUrl=direct_url
-        )
-
-
-class ClipListResponse(BaseModel):
+        fields = {
+            "id": clip.id,
+            "type": clip.type,
+            "createdAt": clip.created_at_ts * 1000,
+            "expiresAt": clip.expires_at_ts * 1000,
+            "maxDownloads": clip.max_downloads,
+            "downloadCount": clip.download_count,
+            "accessCode": clip.access_code,
+            "accessToken": clip.access_token,
+            "payload": ClipPayloadResponse.model_construct(text=clip.text, file=file_payload),
+            "directUrl": f"{prefixes.direct}{clip.access_code}" if clip.access_code else None,
+        }
+        # 数据来自本服务写入的数据库行，已在入库时校验，跳过逐层重复校验
+        return cls.model_construct(**fields)
+
+
+def clip_row_to_item(row: tuple, prefixes: ClipUrlPrefixes) -> dict[str, object]:
+    (
+        clip_id, clip_type, created_at, expires_at, max_downloads, download_count,
+        access_code, access_token, owner_id, text, file_name, file_path, file_size, file_mime,
+    ) = row
+    file_payload = None
+    if file_path:
+        file_payload = {
+            "name": file_name,
+            "size": file_size,
+            "type": file_mime,
+            "downloadUrl": f"{prefixes.file}{clip_id}/file?environmentId={owner_id}",
+        }
+    return {
+        "id": clip_id,
+        "type": clip_type,
+        "createdAt": created_at * 1000,
+        "expiresAt": expires_at * 1000,
+        "maxDownloads": max_downloads,
+        "downloadCount": download_count,
+        "accessCode": access_code,
+        "accessToken": access_token,
+        "payload": {"text": text, "file": file_payload},
+        "directUrl": f"{prefixes.direct}{access_code}" if access_code else None,
+    }
+
+
+class ClipListResponse(ApiModel):
     items: list[ClipResponse]
 
 
-class DeleteResponse(BaseModel):
+class DeleteResponse(ApiModel):
     ok: bool
 
 
-class IncrementResponse(BaseModel):
+class IncrementResponse(ApiModel):
     clip: ClipResponse
     removed: bool
 
 
-class AppConfigResponse(BaseModel):
-    captchaProvider: Optional[Literal["turnstile", "recaptcha"]]
+class AppConfigResponse(ApiModel):
+    captchaProvider: Optional[CaptchaProvider]
     captchaSiteKey: Optional[str]
 
 
-class TokenRegisterRequest(BaseModel):
-    token: str = Field(min_length=7)
-    environmentId: Optional[str] = Field(default=None, min_length=1, max_length=64)
-
-    @field_validator("token")
-    @classmethod
-    def ensure_token(cls, value: str) -> str:
-        trimmed = value.strip()
-        if not trimmed:
-            raise ValueError("持久 Token 无效")
-        return trimmed
-
-    @field_validator("environmentId")
-    @classmethod
-    def ensure_owner(cls, value: Optional[str]) -> Optional[str]:
-        if value is None:
-            return value
-        trimmed = value.strip()
-        if not trimmed:
-            return None
-        return trimmed
+class TokenRegisterRequest(ApiModel):
+    token: PersistentToken
+    environmentId: Optional[OwnerId] = None
 
 
-class TokenRegisterResponse(BaseModel):
+class TokenRegisterResponse(ApiModel):
     token: str
     environmentId: str
     updatedAt: int
@@ -1,32 +1,109 @@
-import base64
+import asyncio
+import binascii
+import itertools
 import mimetypes
-from datetime import datetime
+import re
+import time
+from functools import lru_cache
 from pathlib import Path
-from typing import Tuple
+from typing import AsyncIterator, Iterator, Tuple
 from .config import settings
 from .models import StoredFile
 
+try:
+    # pybase64 使用 SIMD 解码，未安装时回退到标准库的 C 实现
+    from pybase64 import b64decode as _b64decode
+except ImportError:  # pragma: no cover - 取决于部署环境
+    _b64decode = binascii.a2b_base64
 
-def _parse_data_url(data_url: str) -> Tuple[str, bytes]:
+_UPLOAD_COUNTER = itertools.count()
+# 4 的整数倍，保证分段解码不破坏 base64 对齐，每段约解码出 1 MiB
+_DECODE_CHUNK_CHARS = (1024 * 1024 // 3) * 4
+# b64decode 会忽略字母表外的字符（如换行），分段前需先剔除，否则会破坏对齐
+_NON_BASE64_CHARS = re.compile(r"[^A-Za-z0-9+/=]")
+# 上传分段先在内存中攒到约 1 MiB 再交给线程写盘，减少线程切换次数
+_UPLOAD_WRITE_BUFFER_BYTES = 1024 * 1024
+
+
+def _split_data_url(data_url: str) -> Tuple[str, str]:
     if not data_url.startswith("data:"):
         raise ValueError("无效的文件数据 URL")
-    header, encoded = data_url.split(",", 1)
+    header, separator, encoded = data_url.partition(",")
+    if not separator:
+        raise ValueError("无效的文件数据 URL")
     mime = header.split(";")[0][5:] or "application/octet-stream"
-    try:
-        payload = base64.b64decode(encoded)
-    except Exception as exc:  # pragma: no cover - defensive path
-        raise ValueError("文件数据解码失败") from exc
-    return mime, payload
+    if _NON_BASE64_CHARS.search(encoded):
+        encoded = _NON_BASE64_CHARS.sub("", encoded)
+    return mime, encoded
 
 
-def store_data_url(filename: str, data_url: str) -> StoredFile:
-    mime, data = _parse_data_url(data_url)
+def _iter_decoded(encoded: str) -> Iterator[bytes]:
+    for start in range(0, len(encoded), _DECODE_CHUNK_CHARS):
+        yield _b64decode(encoded[start:start + _DECODE_CHUNK_CHARS])
+
+
+class FileTooLargeError(ValueError):
+    pass
+
+
+@lru_cache(maxsize=256)
+def _guess_extension(mime: str) -> str:
+    return mimetypes.guess_extension(mime) or ""
+
+
+def _allocate_destination(filename: str, mime: str) -> Tuple[str, Path]:
     safe_name = filename or "uploaded"
-    timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
     suffix = Path(safe_name).suffix
-    guessed_suffix = mimetypes.guess_extension(mime) or ""
-    final_suffix = suffix or guessed_suffix
-    storage_name = f"{timestamp}{final_suffix}"
-    destination = settings.file_storage_dir / storage_name
-    destination.write_bytes(data)
-    return StoredFile(name=safe_name, size=len(data), mime=mime, path=destination)
+    final_suffix = suffix or _guess_extension(mime)
+    # 纳秒时间戳加进程内计数器，并发上传也不会重名
+    storage_name = f"{time.time_ns():x}{next(_UPLOAD_COUNTER):x}{final_suffix}"
+    return safe_name, settings.file_storage_dir / storage_name
+
+
+def store_data_url(filename: str, data_url: str) -> StoredFile:
+    mime, encoded = _split_data_url(data_url)
+    safe_name, destination = _allocate_destination(filename, mime)
+    try:
+        with destination.open("wb") as handle:
+            handle.writelines(_iter_decoded(encoded))
+            size = handle.tell()
+    except (binascii.Error, ValueError) as exc:
+        destination.unlink(missing_ok=True)
+        raise ValueError("文件数据解码失败") from exc
+    return StoredFile(name=safe_name, size=size, mime=mime, path=destination)
+
+
+async def store_upload_stream(
+    filename: str,
+    mime: str,
+    chunks: AsyncIterator[bytes],
+    max_size: int,
+) -> StoredFile:
+    # 原始二进制请求体直接落盘，不经过 base64 与 JSON 字符串；超过上限立即中止
+    mime = mime or "application/octet-stream"
+    safe_name, destination = _allocate_destination(filename, mime)
+    size = 0
+    # 打开、写入与关闭文件都放到线程中执行，避免大文件写盘阻塞事件循环
+    handle = await asyncio.to_thread(destination.open, "wb")
+    try:
+        try:
+            buffer: list[bytes] = []
+            buffered = 0
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_size:
+                    raise FileTooLargeError("文件体积超过限制")
+                buffer.append(chunk)
+                buffered += len(chunk)
+                if buffered >= _UPLOAD_WRITE_BUFFER_BYTES:
+                    await asyncio.to_thread(handle.writelines, buffer)
+                    buffer = []
+                    buffered = 0
+            if buffer:
+                await asyncio.to_thread(handle.writelines, buffer)
+        finally:
+            await asyncio.to_thread(handle.close)
+    except BaseException:
+        destination.unlink(missing_ok=True)
+        raise
+    return StoredFile(name=safe_name, size=size, mime=mime, path=destination)
@@ -1,25 +1,34 @@
 import base64
 import os
+import sqlite3
 import sys
+import threading
 from datetime import datetime, timedelta, timezone
 from importlib import import_module
 
 from fastapi.testclient import TestClient
 
 
+SETTINGS_DEPENDENT_MODULES = ("backend.main", "backend.repository", "backend.storage", "backend.config")
+
+
 def build_client(tmp_path, extra_env: dict[str, str] | None = None):
-    db_path = tmp_path / "clips.db"
+    # 每个测试使用独立的共享缓存内存库，省去磁盘文件与 fsync
+    db_path = f"file:clips-{tmp_path.name}?mode=memory&cache=shared"
     files_dir = tmp_path / "files"
     static_dir = tmp_path / "static"
+    # 先清掉前一个测试留下的全部配置项，避免断言失败时 extra_env 泄漏到后续测试
+    for key in [key for key in os.environ if key.startswith("SUPER_CLIPBOARD_")]:
+        del os.environ[key]
     os.environ["SUPER_CLIPBOARD_DATABASE_PATH"] = str(db_path)
     os.environ["SUPER_CLIPBOARD_FILE_STORAGE_DIR"] = str(files_dir)
     os.environ["SUPER_CLIPBOARD_STATIC_ROOT"] = str(static_dir)
     for key, value in (extra_env or {}).items():
         os.environ[key] = value
 
-    for module in list(sys.modules):
-        if module.startswith("backend."):
-            del sys.modules[module]
+    # 只重新导入读取配置的模块，schemas 等与配置无关的模块保持已构建状态
+    for module in SETTINGS_DEPENDENT_MODULES:
+        sys.modules.pop(module, None)
 
     backend_main = import_module("backend.main")
     app = backend_main.app
@@ -218,3 +227,404 @@ def test_config_endpoint(tmp_path):
         data = resp.json()
         assert data["captchaProvider"] == "turnstile"
         assert data["captchaSiteKey"] == "site-key-demo"
+
+
+def test_owner_prefixed_identifier(tmp_path):
+    with build_client(tmp_path) as client:
+        register = client.post(
+            "/api/tokens/register",
+            json={"token": "prefixed1"}
+        )
+        environment_id = register.json()["environmentId"]
+
+        for access_code, text in (("24680", "by code"), (None, "by token")):
+            body = {
+                "type": "text",
+                "expiresAt": future_timestamp(),
+                "maxDownloads": 5,
+                "environmentId": environment_id,
+                "payload": {"text": text},
+            }
+            if access_code:
+                body["accessCode"] = access_code
+            else:
+                body["accessToken"] = "prefixed1"
+            assert client.post("/api/clips", json=body).status_code == 201
+
+        by_code = client.get(f"/{environment_id}.24680/raw")
+        assert by_code.status_code == 200
+        assert by_code.text == "by code"
+
+        by_token = client.get(f"/{environment_id}.prefixed1/raw")
+        assert by_token.status_code == 200
+        assert by_token.text == "by token"
+
+        wrong_owner = client.get("/someone-else.prefixed1/raw")
+        assert wrong_owner.status_code == 404
+
+
+def test_cors_headers(tmp_path):
+    with build_client(tmp_path) as client:
+        plain = client.get("/healthz")
+        assert "access-control-allow-origin" not in plain.headers
+
+        simple = client.get("/healthz", headers={"Origin": "https://example.com"})
+        assert simple.headers["access-control-allow-origin"] == "*"
+
+        preflight = client.options(
+            "/api/clips",
+            headers={
+                "Origin": "https://example.com",
+                "Access-Control-Request-Method": "POST",
+                "Access-Control-Request-Headers": "content-type",
+            },
+        )
+        assert preflight.status_code == 204
+        assert preflight.headers["access-control-allow-origin"] == "*"
+        assert "POST" in preflight.headers["access-control-allow-methods"]
+        assert preflight.headers["access-control-allow-headers"] == "content-type"
+
+
+def test_duplicate_access_code_conflict(tmp_path):
+    with build_client(tmp_path) as client:
+        body = {
+            "type": "text",
+            "expiresAt": future_timestamp(),
+            "maxDownloads": 1,
+            "accessCode": "11111",
+            "environmentId": "owner-dup",
+            "payload": {"text": "first"},
+        }
+        assert client.post("/api/clips", json=body).status_code == 201
+        duplicate = client.post("/api/clips", json=body)
+        assert duplicate.status_code == 409
+        assert "已存在" in duplicate.json()["detail"]
+
+        expired = client.post("/api/clips", json={**body, "accessCode": "22222", "expiresAt": 1000})
+        assert expired.status_code == 400
+
+
+def test_static_index_and_assets(tmp_path):
+    assets_dir = tmp_path / "static" / "assets"
+    assets_dir.mkdir(parents=True)
+    (tmp_path / "static" / "index.html").write_text("<html>app</html>", encoding="utf-8")
+    (assets_dir / "app.js").write_text("console.log(1)", encoding="utf-8")
+    with build_client(tmp_path) as client:
+        index = client.get("/")
+        assert index.status_code == 200
+        assert index.text == "<html>app</html>"
+
+        asset = client.get("/assets/app.js")
+        assert asset.status_code == 200
+        assert asset.text == "console.log(1)"
+
+
+def test_repository_writes_from_worker_thread(tmp_path):
+    with build_client(tmp_path) as client:
+        repository = sys.modules["backend.main"].repository
+        errors: list[BaseException] = []
+
+        def create() -> None:
+            try:
+                repository.create_clip(
+                    clip_type="text",
+                    expires_at_ms=future_timestamp(),
+                    max_downloads=1,
+                    access_code="13579",
+                    access_token=None,
+                    environment_id="owner-thread",
+                    text="from worker",
+                    stored_file=None,
+                )
+            except BaseException as error:  # pragma: no cover - surfaced below
+                errors.append(error)
+
+        worker = threading.Thread(target=create)
+        worker.start()
+        worker.join(timeout=10)
+        assert not worker.is_alive()
+        assert errors == []
+
+        listed = client.get("/api/clips", params={"environmentId": "owner-thread"})
+        assert [item["payload"]["text"] for item in listed.json()["items"]] == ["from worker"]
+
+
+def test_failed_commit_rolls_back_reused_connection(tmp_path):
+    with build_client(tmp_path):
+        repository = sys.modules["backend.main"].repository
+        conn = repository._get_conn()
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.execute("CREATE TABLE parents (id INTEGER PRIMARY KEY)")
+        conn.execute(
+            "CREATE TABLE children (parent_id INTEGER REFERENCES parents(id) DEFERRABLE INITIALLY DEFERRED)"
+        )
+
+        # 延迟外键约束在 COMMIT 时才失败
+        try:
+            with repository._transaction() as tx:
+                tx.execute("INSERT INTO children (parent_id) VALUES (1)")
+        except sqlite3.IntegrityError:
+            pass
+        else:  # pragma: no cover - surfaced below
+            raise AssertionError("COMMIT should have failed")
+        assert not conn.in_transaction
+
+        with repository._transaction() as tx:
+            tx.execute("INSERT INTO parents (id) VALUES (1)")
+        assert conn.execute("SELECT COUNT(*) FROM children").fetchone()[0] == 0
+
+
+def test_list_hides_inactive_clips(tmp_path):
+    with build_client(tmp_path) as client:
+        environment_id = "owner-inactive"
+        created = []
+        for text in ("expired", "exhausted", "active"):
+            response = client.post(
+                "/api/clips",
+                json={
+                    "type": "text",
+                    "expiresAt": future_timestamp(),
+                    "maxDownloads": 3,
+                    "environmentId": environment_id,
+                    "payload": {"text": text},
+                },
+            )
+            assert response.status_code == 201
+            created.append(response.json()["id"])
+
+        # 直接改库模拟过期与次数用尽，绕开请求路径上的清理
+        with sqlite3.connect(os.environ["SUPER_CLIPBOARD_DATABASE_PATH"], uri=True) as conn:
+            conn.execute("UPDATE clips SET expires_at = 1 WHERE id = ?", (created[0],))
+            conn.execute("UPDATE clips SET download_count = max_downloads WHERE id = ?", (created[1],))
+
+        listed = client.get("/api/clips", params={"environmentId": environment_id})
+        assert [item["payload"]["text"] for item in listed.json()["items"]] == ["active"]
+
+
+def test_large_file_with_line_wrapped_base64(tmp_path):
+    file_content = os.urandom(3 * 1024 * 1024 + 7)
+    data_url = "data:application/octet-stream;base64," + base64.encodebytes(file_content).decode("ascii")
+
+    with build_client(tmp_path) as client:
+        environment_id = "owner-large"
+        response = client.post(
+            "/api/clips",
+            json={
+                "type": "file",
+                "expiresAt": future_timestamp(),
+                "maxDownloads": 1,
+                "environmentId": environment_id,
+                "payload": {
+                    "file": {
+                        "name": "large.bin",
+                        "size": len(file_content),
+                        "dataUrl": data_url,
+                    }
+                },
+            },
+        )
+        assert response.status_code == 201
+        assert response.json()["payload"]["file"]["size"] == len(file_content)
+
+        download = client.get(f"/api/clips/{response.json()['id']}/file", params={"environmentId": environment_id})
+        assert download.status_code == 200
+        assert download.content == file_content
+
+
+def test_direct_link_cache_invalidated_on_delete(tmp_path):
+    with build_client(tmp_path) as client:
+        environment_id = "owner-12345"
+        response = client.post(
+            "/api/clips",
+            json={
+                "type": "text",
+                "expiresAt": future_timestamp(),
+                "maxDownloads": 5,
+                "accessCode": "24680",
+                "environmentId": environment_id,
+                "payload": {"text": "cached text"},
+            },
+        )
+        assert response.status_code == 201
+        clip = response.json()
+
+        assert client.get("/24680").status_code == 200
+        assert client.get("/api/clips/code/24680").status_code == 200
+
+        deleted = client.delete(f"/api/clips/{clip['id']}", params={"environmentId": environment_id})
+        assert deleted.status_code == 200
+
+        assert client.get("/24680").status_code == 404
+
+
+def test_direct_link_cache_holds_metadata_only(tmp_path):
+    with build_client(tmp_path) as client:
+        response = client.post(
+            "/api/clips",
+            json={
+                "type": "text",
+                "expiresAt": future_timestamp(),
+                "maxDownloads": 5,
+                "accessCode": "13579",
+                "environmentId": "owner-13579",
+                "payload": {"text": "metadata only"},
+            },
+        )
+        assert response.status_code == 201
+
+        assert client.get("/api/clips/code/13579").status_code == 200
+        assert client.get("/13579/raw").text == "metadata only"
+        assert client.get("/api/clips/code/13579").json()["downloadCount"] == 1
+
+        models = import_module("backend.models")
+        cache = import_module("backend.main").repository._lookup_cache
+        assert cache._entries
+        assert all(isinstance(meta, models.ClipMeta) for _, meta in cache._entries.values())
+
+
+def test_deleted_file_removed_from_storage(tmp_path):
+    file_content = b"remove me"
+    data_url = "data:text/plain;base64," + base64.b64encode(file_content).decode("ascii")
+
+    with build_client(tmp_path) as client:
+        environment_id = "owner-file"
+        response = client.post(
+            "/api/clips",
+            json={
+                "type": "file",
+                "expiresAt": future_timestamp(),
+                "maxDownloads": 3,
+                "environmentId": environment_id,
+                "payload": {
+                    "file": {
+                        "name": "remove.txt",
+                        "size": len(file_content),
+                        "type": "text/plain",
+                        "dataUrl": data_url,
+                    }
+                },
+            },
+        )
+        assert response.status_code == 201
+        clip = response.json()
+        assert len(list((tmp_path / "files").iterdir())) == 1
+
+        deleted = client.delete(f"/api/clips/{clip['id']}", params={"environmentId": environment_id})
+        assert deleted.status_code == 200
+
+    # 关闭时会等待后台删除任务完成
+    assert list((tmp_path / "files").iterdir()) == []
+
+
+def test_binary_upload_clip(tmp_path):
+    file_content = os.urandom(300_000)
+
+    with build_client(tmp_path) as client:
+        environment_id = "owner-upload"
+        response = client.post(
+            "/api/clips/upload",
+            params={
+                "name": "blob.bin",
+                "expiresAt": future_timestamp(),
+                "maxDownloads": 2,
+                "environmentId": environment_id,
+            },
+            content=file_content,
+            headers={"content-type": "application/octet-stream"},
+        )
+        assert response.status_code == 201
+        clip = response.json()
+        assert clip["type"] == "file"
+        assert clip["payload"]["file"]["size"] == len(file_content)
+        assert clip["payload"]["file"]["type"] == "application/octet-stream"
+
+        download = client.get(f"/api/clips/{clip['id']}/file", params={"environmentId": environment_id})
+        assert download.status_code == 200
+        assert download.content == file_content
+
+    with build_client(tmp_path, {"SUPER_CLIPBOARD_MAX_FILE_SIZE_BYTES": "1024"}) as client:
+        too_large = client.post(
+            "/api/clips/upload",
+            params={
+                "name": "big.bin",
+                "expiresAt": future_timestamp(),
+                "environmentId": "owner-upload",
+            },
+            content=file_content,
+        )
+        assert too_large.status_code == 413
+    assert len(list((tmp_path / "files").iterdir())) == 1
+
+
+def test_create_clip_validation_errors(tmp_path):
+    with build_client(tmp_path) as client:
+        missing = client.post("/api/clips", json={"type": "text", "environmentId": "owner-12345"})
+        assert missing.status_code == 422
+        assert missing.json()["detail"][0]["loc"][0] == "body"
+
+        invalid = client.post(
+            "/api/clips",
+            content=b"not json",
+            headers={"content-type": "application/json"},
+        )
+        assert invalid.status_code == 422
+
+
+def test_inline_json_schema_keeps_mapping_properties():
+    schemas = import_module("backend.schemas")
+    inlined = schemas.inline_json_schema(
+        {
+            "properties": {"mapping": {"$ref": "#/$defs/Mapping"}},
+            "discriminator": {"propertyName": "type", "mapping": {"a": "#/$defs/Mapping"}},
+            "$defs": {"Mapping": {"type": "object"}},
+        }
+    )
+    assert inlined["properties"] == {"mapping": {"type": "object"}}
+    assert inlined["discriminator"] == {"propertyName": "type"}
+
+
+def test_oversized_create_body_rejected(tmp_path):
+    with build_client(tmp_path, {"SUPER_CLIPBOARD_MAX_FILE_SIZE_BYTES": "1024"}) as client:
+        data_url = "data:application/octet-stream;base64," + base64.b64encode(os.urandom(200_000)).decode("ascii")
+        response = client.post(
+            "/api/clips",
+            json={
+                "type": "file",
+                "expiresAt": future_timestamp(),
+                "environmentId": "owner-large",
+                "payload": {
+                    "file": {
+                        "name": "large.bin",
+                        "size": 200_000,
+                        "type": "application/octet-stream",
+                        "dataUrl": data_url,
+                    }
+                },
+            },
+        )
+        assert response.status_code == 413
+    assert list((tmp_path / "files").iterdir()) == []
+
+
+def test_long_text_direct_link_streamed(tmp_path):
+    text = "<tag> & 文本\n" * 20_000
+
+    with build_client(tmp_path) as client:
+        response = client.post(
+            "/api/clips",
+            json={
+                "type": "text",
+                "expiresAt": future_timestamp(),
+                "maxDownloads": 2,
+                "accessCode": "97531",
+                "environmentId": "owner-long",
+                "payload": {"text": text},
+            },
+        )
+        assert response.status_code == 201
+
+        direct = client.get("/97531")
+        assert direct.status_code == 200
+        assert direct.headers["content-type"].startswith("text/html")
+        assert direct.text.count("&lt;tag&gt; &amp; 文本") == 20_000
+        assert direct.text.endswith("</html>")
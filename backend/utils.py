@@ -1,77 +1,213 @@
+import asyncio
+import hmac
+import html
 from datetime import datetime
-from typing import Optional
+from functools import lru_cache
+from typing import AsyncIterator, Iterator, NamedTuple
+from urllib.parse import urlencode
 import httpx
+import orjson
 from fastapi import HTTPException, Request
+from starlette.datastructures import URL
 
 
-def build_text_clip_html(content: str, created_at: datetime, download_count: int, code: str | None) -> str:
-    escaped = (
-        content.replace("&", "&amp;")
-        .replace("<", "&lt;")
-        .replace(">", "&gt;")
-    )
-    created = created_at.astimezone().strftime("%Y-%m-%d %H:%M:%S")
-    title_code = code or ""
-    return f"""<!doctype html>
+# 模板预先拆成固定片段，请求路径上只做一次转义与拼接，无需每次解析格式串
+_TEXT_CLIP_HEAD = """<!doctype html>
 <html lang=\"zh-CN\">
   <head>
     <meta charset=\"utf-8\" />
-    <title>Super Clipboard 直链 {title_code}</title>
+    <title>Super Clipboard 直链 """
+_TEXT_CLIP_BODY = """</title>
     <meta name=\"viewport\" content=\"width=device-width,initial-scale=1\" />
     <style>
-      body {{ font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif; margin: 32px; color: #0f172a; background: #f8fafc; }}
-      pre {{ white-space: pre-wrap; word-break: break-word; padding: 24px; background: #fff; border-radius: 16px; box-shadow: 0 12px 32px rgba(15, 23, 42, 0.12); }}
-      footer {{ margin-top: 24px; font-size: 0.875rem; color: #64748b; }}
+      body { font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif; margin: 32px; color: #0f172a; background: #f8fafc; }
+      pre { white-space: pre-wrap; word-break: break-word; padding: 24px; background: #fff; border-radius: 16px; box-shadow: 0 12px 32px rgba(15, 23, 42, 0.12); }
+      footer { margin-top: 24px; font-size: 0.875rem; color: #64748b; }
     </style>
   </head>
   <body>
     <h1>直链文本</h1>
-    <pre>{escaped}</pre>
-    <footer>创建于 {created}, 下载次数 {download_count}</footer>
-  </body>
-</html>"""
+    <pre>"""
+_TEXT_CLIP_FOOTER = "</pre>\n    <footer>创建于 ".encode()
+_TEXT_CLIP_TAIL = "</footer>\n  </body>\n</html>".encode()
+
+
+TEXT_CLIP_SLICE_CHARS = 64 * 1024
+
+
+@lru_cache(maxsize=1024)
+def _text_clip_head(code: str | None) -> bytes:
+    return f"{_TEXT_CLIP_HEAD}{html.escape(code or '', quote=False)}{_TEXT_CLIP_BODY}".encode()
+
+
+def iter_text_clip_html(
+    content: str,
+    created_at_ts: int,
+    download_count: int,
+    code: str | None,
+) -> Iterator[bytes]:
+    # 正文按固定长度分段转义，HTML 转义逐字符进行，分段不会截断实体
+    # 固定片段预先编码为 UTF-8，只对正文与页脚变量部分编码
+    created = datetime.fromtimestamp(created_at_ts).isoformat(" ", "seconds")
+    yield _text_clip_head(code)
+    for start in range(0, len(content), TEXT_CLIP_SLICE_CHARS):
+        chunk = content[start:start + TEXT_CLIP_SLICE_CHARS]
+        # 常见的纯文本不含特殊字符，跳过逐字符转义直接输出
+        if "&" in chunk or "<" in chunk or ">" in chunk:
+            chunk = html.escape(chunk, quote=False)
+        yield chunk.encode()
+    yield _TEXT_CLIP_FOOTER
+    yield f"{created}, 下载次数 {download_count}".encode()
+    yield _TEXT_CLIP_TAIL
+
+
+def build_text_clip_html(content: str, created_at_ts: int, download_count: int, code: str | None) -> bytes:
+    return b"".join(iter_text_clip_html(content, created_at_ts, download_count, code))
+
+
+async def stream_text_clip_html(
+    content: str,
+    created_at_ts: int,
+    download_count: int,
+    code: str | None,
+) -> AsyncIterator[bytes]:
+    # 异步迭代器直接在事件循环中产出分段，StreamingResponse 不必为每段切换到线程池
+    for chunk in iter_text_clip_html(content, created_at_ts, download_count, code):
+        yield chunk
+
+
+_CAPTCHA_VERIFY_ENDPOINTS = {
+    "turnstile": "https://challenges.cloudflare.com/turnstile/v0/siteverify",
+    "recaptcha": "https://www.google.com/recaptcha/api/siteverify",
+}
+_CAPTCHA_FORM_HEADERS = {"Content-Type": "application/x-www-form-urlencoded"}
+_CAPTCHA_MAX_KEEPALIVE_CONNECTIONS = 20
+_captcha_client: httpx.AsyncClient | None = None
+# 并发校验数与连接池保活连接数一致，超出部分排队等待而非挤占连接池
+_captcha_semaphore = asyncio.Semaphore(_CAPTCHA_MAX_KEEPALIVE_CONNECTIONS)
+
+
+def _get_captcha_client() -> httpx.AsyncClient:
+    # 进程内复用连接池，避免每次校验重新建立 TCP/TLS 连接
+    global _captcha_client
+    if _captcha_client is None:
+        # 连接失败时重试一次；显式传入 transport 后连接池参数需设置在 transport 上
+        _captcha_client = httpx.AsyncClient(
+            timeout=None,
+            transport=httpx.AsyncHTTPTransport(
+                retries=1,
+                limits=httpx.Limits(
+                    max_connections=50,
+                    max_keepalive_connections=_CAPTCHA_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=30.0,
+                ),
+            ),
+        )
+    return _captcha_client
+
+
+async def close_captcha_client() -> None:
+    global _captcha_client
+    client, _captcha_client = _captcha_client, None
+    if client is not None:
+        await client.aclose()
+
+
+@lru_cache(maxsize=16)
+def _format_base_url(
+    scheme: str,
+    host: str | None,
+    server: tuple[str, int] | None,
+    root_path: str,
+) -> str:
+    headers = [(b"host", host.encode("latin-1"))] if host else []
+    scope = {
+        "type": "http",
+        "scheme": scheme,
+        "server": server,
+        "path": root_path if root_path.endswith("/") else root_path + "/",
+        "query_string": b"",
+        "headers": headers,
+    }
+    return str(URL(scope=scope)).rstrip("/")
 
 
 def build_base_url(request: Request) -> str:
-    return str(request.base_url).rstrip("/")
+    scope = request.scope
+    server = scope.get("server")
+    return _format_base_url(
+        scope.get("scheme", "http"),
+        request.headers.get("host"),
+        tuple(server) if server else None,
+        scope.get("app_root_path", scope.get("root_path", "")),
+    )
 
 
-async def verify_captcha_token(
-    token: Optional[str],
-    provider: Optional[str],
-    secret: Optional[str],
-    remote_ip: Optional[str] = None,
-    *,
-    timeout_seconds: float = 6.0,
-    bypass_token: Optional[str] = None,
-) -> None:
-    if provider is None or not secret:
-        return
+class CaptchaResult(NamedTuple):
+    ok: bool
+    detail: str | None = None
+
+
+_CAPTCHA_OK = CaptchaResult(True)
+
+
+async def _verify_captcha_impl(
+    token: str | None,
+    provider: str,
+    secret: str,
+    remote_ip: str | None,
+    timeout_seconds: float,
+    bypass_token: str | None,
+) -> CaptchaResult:
+    # 只返回校验结果，由调用方决定如何报错，成功路径不构造异常对象
     if not token:
-        raise HTTPException(status_code=400, detail="缺少验证码，请重新验证后再试")
-    if bypass_token and token == bypass_token:
-        return
+        return CaptchaResult(False, "缺少验证码，请重新验证后再试")
+    # 非 ASCII 字符串不能直接参与 compare_digest，统一按 UTF-8 字节比较
+    if bypass_token and hmac.compare_digest(token.encode(), bypass_token.encode()):
+        return _CAPTCHA_OK
 
-    endpoint = {
-        "turnstile": "https://challenges.cloudflare.com/turnstile/v0/siteverify",
-        "recaptcha": "https://www.google.com/recaptcha/api/siteverify",
-    }.get(provider)
+    endpoint = _CAPTCHA_VERIFY_ENDPOINTS.get(provider)
     if not endpoint:
-        raise HTTPException(status_code=400, detail="验证码服务未配置")
+        return CaptchaResult(False, "验证码服务未配置")
 
-    payload: dict[str, str] = {"secret": secret, "response": token}
+    # httpx 的 data 只接受映射，这里直接编码表单正文，省去字典构建
+    payload = [("secret", secret), ("response", token)]
     if remote_ip:
-        payload["remoteip"] = remote_ip
+        payload.append(("remoteip", remote_ip))
 
-    async with httpx.AsyncClient(timeout=timeout_seconds) as client:
-        response = await client.post(endpoint, data=payload)
+    # 截止时间覆盖排队与请求全过程，由事件循环到期直接取消
+    try:
+        async with asyncio.timeout(timeout_seconds), _captcha_semaphore:
+            response = await _get_captcha_client().post(
+                endpoint,
+                content=urlencode(payload),
+                headers=_CAPTCHA_FORM_HEADERS,
+            )
+    except TimeoutError:
+        return CaptchaResult(False, "验证码校验超时，请稍后再试")
     try:
-        data = response.json()
-    except Exception as error:  # pragma: no cover - defensive
-        raise HTTPException(status_code=400, detail="验证码校验失败") from error
+        data = orjson.loads(response.content)
+    except Exception:  # pragma: no cover - defensive
+        return CaptchaResult(False, "验证码校验失败")
 
     success = bool(data.get("success"))
     if not success:
-        codes = ", ".join(data.get("error-codes", []) or [])
-        detail = "验证码校验失败" + (f"（{codes}）" if codes else "")
-        raise HTTPException(status_code=400, detail=detail)
+        codes = data.get("error-codes")
+        return CaptchaResult(False, f"验证码校验失败（{', '.join(codes)}）" if codes else "验证码校验失败")
+    return _CAPTCHA_OK
+
+
+async def verify_captcha_token(
+    token: str | None,
+    provider: str | None,
+    secret: str | None,
+    remote_ip: str | None = None,
+    *,
+    timeout_seconds: float = 6.0,
+    bypass_token: str | None = None,
+) -> None:
+    if provider is None or not secret:
+        return
+    result = await _verify_captcha_impl(token, provider, secret, remote_ip, timeout_seconds, bypass_token)
+    if not result.ok:
+        raise HTTPException(status_code=400, detail=result.detail)